@@ -1,51 +1,214 @@
-import requests
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlparse
+import aiohttp
+import diskcache
 from bs4 import BeautifulSoup
+import soupsieve as sv
+
+# Define headers with a User-Agent to mimic a browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
+}
+
+MAX_CONCURRENCY = 20
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+# Longest we'll wait on a Retry-After or rate limit reset before trying again
+MAX_BACKOFF = 60
+
+# Lot sizes already scraped, keyed by details URL, persisted between runs
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'data')
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, 'http_cache')
+
+# The meta-value span inside the li whose class contains PropertyLotSizeMetastyles__StyledPropertyLotSizeMeta.
+# This is realtor.com listing markup; Zillow details pages don't have it, so only realtor.com URLs are fetched.
+LOT_SIZE_HOST = 'realtor.com'
+_LOT_SIZE_SEL = sv.compile('li[class*="PropertyLotSizeMetastyles__StyledPropertyLotSizeMeta"] span.meta-value')
+
+class AdaptiveSemaphore:
+    """Semaphore whose capacity can shrink under rate limiting and grow back as requests succeed.
+
+    It can also be paused, holding every new request until a rate limit window resets.
+    """
+
+    def __init__(self, value):
+        self._sem = asyncio.Semaphore(value)
+        self.max_capacity = value
+        self.capacity = value
+        self._pending_shrink = 0
+        self._resume_at = 0.0
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        try:
+            # Hold off while the server's rate limit window is exhausted
+            delay = self._resume_at - asyncio.get_running_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._sem.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        # Swallow released slots until pending shrinks are paid off
+        if self._pending_shrink:
+            self._pending_shrink -= 1
+        else:
+            self._sem.release()
+
+    def shrink(self):
+        if self.capacity > 1:
+            self.capacity -= 1
+            self._pending_shrink += 1
+
+    def pause(self, seconds):
+        self._resume_at = max(self._resume_at, asyncio.get_running_loop().time() + seconds)
+
+    def grow(self):
+        if self.capacity < self.max_capacity:
+            self.capacity += 1
+            if self._pending_shrink:
+                self._pending_shrink -= 1
+            else:
+                self._sem.release()
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retrying, from Retry-After or exponential backoff with jitter."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), MAX_BACKOFF)
+    return min(BACKOFF_BASE * 2 ** attempt + random.random(), MAX_BACKOFF)
+
+def _rate_limit_reset_delay(headers):
+    """Seconds until the rate limit window resets, from X-RateLimit-Reset as a delay or epoch time."""
+    reset = headers.get('X-RateLimit-Reset', '')
+    if not reset.isdigit():
+        return BACKOFF_BASE
+    delay = int(reset)
+    # Large values are an epoch timestamp rather than a number of seconds
+    if delay > 1_000_000_000:
+        delay -= time.time()
+    return min(max(delay, 0), MAX_BACKOFF)
+
+async def fetch_with_retry(session, url, sem, max_retries=MAX_RETRIES):
+    """GET a URL and return its body, backing off on 429/5xx and adapting concurrency to rate limiting."""
+    for attempt in range(max_retries):
+        response = None
+        try:
+            async with sem:
+                async with session.get(url) as response:
+                    if response.status == 429:
+                        sem.shrink()
+                    response.raise_for_status()  # Raise exception for bad status codes
+                    body = await response.text()
+
+                    # X-RateLimit-Remaining is a per-window request quota, not a concurrency
+                    # limit, so it is only acted on once exhausted: every request waits for the
+                    # window to reset. Concurrency itself adapts to 429s alone.
+                    if response.headers.get('X-RateLimit-Remaining') == '0':
+                        sem.pause(_rate_limit_reset_delay(response.headers))
+                    else:
+                        sem.grow()
+                    return body
+        except aiohttp.ClientResponseError as e:
+            if (e.status != 429 and e.status < 500) or attempt == max_retries - 1:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == max_retries - 1:
+                raise
+        # Wait outside the semaphore so other requests can use the slot
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+async def get_lot_size(session, url, sem, cache=None):
+    # Skip the request entirely if this URL was scraped on a previous run.
+    # diskcache get/set are blocking SQLite calls on the event loop; they are
+    # fast local lookups, so they aren't worth pushing to a thread.
+    if cache is not None:
+        lot_size = cache.get(url)
+        if lot_size is not None:
+            return lot_size
 
-def get_lot_size(url):
     try:
-        # Define headers with a User-Agent to mimic a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
-        }
-        
-        # Send GET request with headers
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Raise exception for bad status codes
-        
+        html = await fetch_with_retry(session, url, sem)
+
         # Parse HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the li with class starting with PropertyLotSizeMetastyles__StyledPropertyLotSizeMeta
-        lot_size_element = soup.find('li', class_=lambda x: x and x.startswith('PropertyLotSizeMetastyles__StyledPropertyLotSizeMeta'))
-        
-        if not lot_size_element:
-            print("Lot size element not found.")
-            return None
-            
-        # Find the span with class meta-value
-        meta_value = lot_size_element.find('span', class_='meta-value')
-        
+        soup = BeautifulSoup(html, 'lxml')
+
+        # Find the lot size value
+        meta_value = _LOT_SIZE_SEL.select_one(soup)
+
         if not meta_value:
-            print("Meta value span not found.")
+            print(f"Lot size element not found for {url}.")
             return None
-            
+
         # Extract the text (e.g., "7,841")
         lot_size = meta_value.get_text(strip=True)
-        
+
+        if cache is not None:
+            cache.set(url, lot_size)
+
         return lot_size
-        
-    except requests.RequestException as e:
-        print(f"Error fetching URL: {e}")
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching URL {url}: {e}")
         return None
     except Exception as e:
-        print(f"Error processing content: {e}")
+        print(f"Error processing content for {url}: {e}")
         return None
 
-# Example usage
+def create_session():
+    """Create a ClientSession that keeps connections alive and caches DNS across requests."""
+    connector = aiohttp.TCPConnector(limit=256, limit_per_host=64, keepalive_timeout=30, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=10)
+    return aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout)
+
+async def fetch_all(urls, session=None):
+    """Fetch lot sizes for all URLs concurrently, returned in input order.
+
+    Pass an existing session to reuse its open connections across batches.
+    Results are cached on disk by URL, so only misses hit the network.
+    """
+    sem = AdaptiveSemaphore(MAX_CONCURRENCY)
+    with diskcache.Cache(HTTP_CACHE_DIR) as cache:
+        if session is not None:
+            return await asyncio.gather(*[get_lot_size(session, url, sem, cache) for url in urls])
+        async with create_session() as session:
+            return await asyncio.gather(*[get_lot_size(session, url, sem, cache) for url in urls])
+
+def is_lot_size_url(url):
+    """Whether a details URL is on the site whose markup _LOT_SIZE_SEL matches."""
+    host = urlparse(url).hostname or ''
+    return host == LOT_SIZE_HOST or host.endswith(f".{LOT_SIZE_HOST}")
+
+def needs_lot_size(house_data):
+    """Whether a house has no lot size yet and a details URL that can be scraped for one."""
+    details_url = house_data.get('details_url')
+    return bool(details_url) and not house_data.get('lot_size') and is_lot_size_url(details_url)
+
+def houses_missing_lot_size(houses):
+    """Return {mls_id: details_url} for saved houses that don't have a lot size yet and can be scraped for one."""
+    return {
+        mls_id: house_data['details_url']
+        for mls_id, house_data in houses.items()
+        if needs_lot_size(house_data)
+    }
+
+# Main execution
 if __name__ == "__main__":
-    url = "https://www.realtor.com/realestateandhomes-detail/3036-Larreta_Grand-Prairie_TX_75054_M82019-25487"
-    lot_size = get_lot_size(url)
-    if lot_size:
-        print(f"Lot Size: {lot_size} sqft")
-    else:
-        print("Failed to retrieve lot size.")
\ No newline at end of file
+    from scrape_house_cards import load_existing_houses, append_jsonl, migrate_legacy_json
+
+    # Only fetch lot sizes for saved houses that don't have one yet
+    output_file = os.path.join(DATA_DIR, 'saved_houses.jsonl')
+    migrate_legacy_json(output_file)
+    missing = houses_missing_lot_size(load_existing_houses(output_file))
+    print(f"Fetching lot size for {len(missing)} houses")
+
+    lot_sizes = asyncio.run(fetch_all(list(missing.values())))
+    updates = {mls_id: {'lot_size': lot_size} for mls_id, lot_size in zip(missing, lot_sizes) if lot_size}
+    print(f"Retrieved lot size for {len(updates)} of {len(missing)} houses")
+
+    append_jsonl(updates, output_file)
@@ -1,162 +1,328 @@
 import json
-from bs4 import BeautifulSoup
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from lxml import etree
 import re
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+ZILLOW_URL_PREFIX = 'https://www.zillow.com/'
+
+# Cards serialized and handed to the process pool at a time
+CARD_BATCH_SIZE = 256
+
+# Patterns and selectors used for every property card, compiled once
+_NON_DIGIT_RE = re.compile(r'\D+')
+_IMG_SRC_X = etree.XPath('string((.//img[@src])[1]/@src)', smart_strings=False)
+_PRICE_X = etree.XPath('.//span[@data-testid="data-price-row"]')
+_DETAILS_X = etree.XPath('.//span[contains(@class, "StyledPropertyCardHomeDetails")]')
+_SPANS_X = etree.XPath('.//span')
+_BOLD_X = etree.XPath('.//b')
+_DATAAREA_X = etree.XPath('.//a[contains(@class, "StyledPropertyCardDataArea")]')
+_ADDRESS_X = etree.XPath('.//address')
+_MLSID_X = etree.XPath('.//div[not(*) and contains(text(), "MLS ID")]')
+
+def _read_jsonl(filename):
+    """Read a JSONL file into a dict keyed by MLS ID, merging later lines over earlier ones.
+
+    Lines that can't be decoded (e.g. a record cut short by a crash mid-append)
+    are logged and skipped; any other error propagates.
+    """
+    houses = {}
+    with open(filename, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line) if orjson else json.loads(line)
+                mls_id = record.pop('mls_id')
+            except (ValueError, KeyError, AttributeError, TypeError) as e:
+                log.warning("Skipping bad line %d in '%s': %s", line_number, filename, e)
+                continue
+            houses.setdefault(mls_id, {}).update(record)
+    return houses
+
 def load_existing_houses(filename):
-    """Load existing houses from JSON file if it exists."""
+    """Load existing houses from a JSONL file if it exists, merging later lines over earlier ones."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _read_jsonl(filename)
     except FileNotFoundError:
-        print(f"No existing file found at '{filename}'. Starting fresh.")
+        log.info("No existing file found at '%s'. Starting fresh.", filename)
         return {}
     except Exception as e:
-        print(f"Error loading existing houses from '{filename}': {str(e)}")
+        log.error("Error loading existing houses from '%s': %s", filename, e)
         return {}
 
-def parse_house_data(html_file):
-    # Read HTML content from file
+def _text(element):
+    """Return the stripped text content of an lxml element."""
+    return ''.join(element.itertext()).strip()
+
+def iter_property_cards(html_file):
+    """Stream property card elements out of an HTML file one at a time.
+
+    Each card is cleared once the caller has moved on to the next one, so
+    only a single card's subtree is held in memory at a time.
+    """
+    with open(html_file, 'rb') as file:
+        for _, element in etree.iterparse(file, events=('end',), tag='div', html=True, encoding='utf-8'):
+            # Only property cards have data-test="PropertyListCard-wrapper"
+            if element.get('data-test') != 'PropertyListCard-wrapper':
+                continue
+
+            yield element
+
+            # Release the card and any siblings already processed
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+def parse_card(card, i, url_prefix=ZILLOW_URL_PREFIX):
+    """Extract house data and MLS ID from a single property card element."""
+    house_data = {}
+
+    # Extract Image
+    img_src = _IMG_SRC_X(card)
+    if 'listCardFallBackImage' in img_src:
+        img_src = ''
+    house_data['image'] = img_src
+
+    # Extract Price
+    price = _PRICE_X(card)
+    house_data['price'] = _text(price[0]) if price else ''
+
+    # Extract Bedrooms, Bathrooms, Square Feet
+    house_data['bedrooms'] = ''
+    house_data['bathrooms'] = ''
+    house_data['square_feet'] = ''
+    details = _DETAILS_X(card)
+    if details:
+        for span in _SPANS_X(details[0]):
+            text = _text(span)
+            bold = _BOLD_X(span)
+            value = _text(bold[0]) if bold else ''
+            if 'bds' in text:
+                house_data['bedrooms'] = value
+            elif 'ba' in text:
+                house_data['bathrooms'] = value
+            elif 'sqft' in text:
+                house_data['square_feet'] = value.replace(',', '')
+
+    # Extract Details URL
+    links = _DATAAREA_X(card)
+    link = links[0] if links else None
+    house_data['details_url'] = f"{url_prefix}{link.get('href')}" if link is not None and link.get('href') is not None else ''
+
+    # Extract Address
+    address = _ADDRESS_X(link) if link is not None else []
+    house_data['address'] = _text(address[0]) if address else ''
+
+    # Extract MLS ID
+    mls = _MLSID_X(card)
+    mls_id = ''
+    if mls:
+        mls_text = _text(mls[0])
+        mls_id = _NON_DIGIT_RE.sub('', mls_text)
+        log.debug("Card %d: MLS ID: %s (from text: %s)", i, mls_id, mls_text)
+    else:
+        log.debug("Card %d: No MLS ID found", i)
+
+    return mls_id, house_data
+
+def _parse_serialized_card(args):
+    """Parse one serialized card in a worker process, returning (index, mls_id, house_data or error)."""
+    i, fragment, url_prefix = args
     try:
-        with open(html_file, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-    except FileNotFoundError:
-        print(f"Error: File '{html_file}' not found.")
-        return {}
+        card = etree.fromstring(fragment, etree.HTMLParser(encoding='utf-8'))
+        return (i, *parse_card(card, i, url_prefix))
     except Exception as e:
-        print(f"Error reading file '{html_file}': {str(e)}")
-        return {}
-    
-    # Create BeautifulSoup object
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Dictionary to store houses from this parse
-    houses = {}
-    
-    # Find property cards with data-test="PropertyListCard-wrapper"
-    property_cards = soup.find_all('div', attrs={'data-test': 'PropertyListCard-wrapper'})
-    print(f"Found {len(property_cards)} property cards")
-    
+        return i, '', e
+
+def _iter_parsed_cards(html_file, url_prefix, workers):
+    """Yield (index, mls_id, house_data or error) for each card in page order.
+
+    With workers > 1 cards are serialized and parsed in a process pool,
+    CARD_BATCH_SIZE at a time, so at most one batch is held in memory.
+    """
+    if workers <= 1:
+        for i, card in enumerate(iter_property_cards(html_file), 1):
+            try:
+                yield (i, *parse_card(card, i, url_prefix))
+            except Exception as e:
+                yield i, '', e
+        return
+
+    cards = ((i, etree.tostring(card, encoding='utf-8'), url_prefix) for i, card in enumerate(iter_property_cards(html_file), 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(cards, CARD_BATCH_SIZE)):
+            yield from executor.map(_parse_serialized_card, batch, chunksize=max(1, len(batch) // workers))
+
+def iter_houses(html_file, max_cards=None, url_prefix=ZILLOW_URL_PREFIX, workers=1):
+    """Yield (mls_id, house_data) for each valid, unique property card in page order.
+
+    Stops reading the page after max_cards valid cards when given, and
+    prefixes each card's relative details link with url_prefix. Pass
+    workers > 1 to parse cards in a process pool; it only pays off for very
+    large pages on multi-core machines, so parsing is serial by default.
+    """
+    total_cards = 0
     valid_cards_processed = 0
     seen_mls_ids = set()
     
-    for i, card in enumerate(property_cards, 1):
-        try:
-            # print(f"Processing card {i}")
-            house_data = {}
-            
-            # Extract Image
-            img = card.find('img')
-            img_src = ''
-            if img and img.get('src'):
-                img_src = img.get('src')
-                if 'listCardFallBackImage' in img_src:
-                    # print(f"Card {i}: Found placeholder image, treating as no image")
-                    img_src = ''
-            else:
-                print(f"cannot find image for {i}")
-                
-            house_data['image'] = img_src
-            
-            # Extract Price
-            price = card.find('span', {'data-testid': 'data-price-row'})
-            house_data['price'] = price.text.strip() if price else ''
-            
-            # Extract Bedrooms, Bathrooms, Square Feet
-            details = card.find('span', class_=re.compile('StyledPropertyCardHomeDetails'))
-            if details:
-                detail_spans = details.find_all('span')
-                house_data['bedrooms'] = ''
-                house_data['bathrooms'] = ''
-                house_data['square_feet'] = ''
-                for span in detail_spans:
-                    text = span.text.strip()
-                    if 'bds' in text:
-                        house_data['bedrooms'] = span.find('b').text.strip() if span.find('b') else ''
-                    elif 'ba' in text:
-                        house_data['bathrooms'] = span.find('b').text.strip() if span.find('b') else ''
-                    elif 'sqft' in text:
-                        house_data['square_feet'] = span.find('b').text.strip().replace(',', '') if span.find('b') else ''
-            else:
-                house_data['bedrooms'] = ''
-                house_data['bathrooms'] = ''
-                house_data['square_feet'] = ''
-            
-            # Extract Details URL
-            link = card.find('a', class_=re.compile('StyledPropertyCardDataArea'))
-            house_data['details_url'] = f"https://www.zillow.com/{link['href']}" if link and 'href' in link.attrs else ''
-            
-            # Extract Address
-            address = link.find('address') if link else None
-            house_data['address'] = address.text.strip() if address else ''
+    try:
+        # Cards arrive in page order so the first card with a given MLS ID wins
+        for i, mls_id, result in _iter_parsed_cards(html_file, url_prefix, workers):
+            # Stop reading the page once enough valid cards have been collected
+            if max_cards is not None and valid_cards_processed >= max_cards:
+                break
+            total_cards = i
             
-            # Extract MLS ID
-            mls = card.find('div', string=re.compile(r'MLS ID'))
-            mls_id = ''
-            if mls:
-                mls_text = mls.text.strip()
-                digits = ''.join(re.findall(r'\d+', mls_text))
-                mls_id = digits if digits else ''
-                # print(f"Card {i}: MLS ID: {mls_id} (from text: {mls_text})")
-            else:
-                print(f"Card {i}: No MLS ID found")
+            if isinstance(result, Exception):
+                log.warning("Card %d: Error processing: %s", i, result)
+                continue
             
             # Only process valid cards with unique MLS ID
             if mls_id and mls_id not in seen_mls_ids:
-                houses[mls_id] = house_data
                 seen_mls_ids.add(mls_id)
                 valid_cards_processed += 1
-                # print(f"Card {i}: Added/Updated house with MLS ID {mls_id}")
+                log.debug("Card %d: Added/Updated house with MLS ID %s", i, mls_id)
+                yield mls_id, result
             else:
-                print(f"Card {i}: Skipped (No MLS ID or duplicate MLS ID)")
-                
-        except Exception as e:
-            print(f"Card {i}: Error processing: {str(e)}")
-            continue
+                log.debug("Card %d: Skipped (No MLS ID or duplicate MLS ID)", i)
+    except FileNotFoundError:
+        log.error("File '%s' not found.", html_file)
+        return
+    except Exception as e:
+        log.error("Error reading file '%s': %s", html_file, e)
+        return
     
-    print(f"\nProcessed {valid_cards_processed} valid cards out of {len(property_cards)} total")
-    return houses
+    log.info("Processed %d valid cards out of %d total", valid_cards_processed, total_cards)
+
+def parse_house_data(html_file, max_cards=None, url_prefix=ZILLOW_URL_PREFIX, workers=1):
+    """Parse property cards from an HTML file into a dict keyed by MLS ID."""
+    return dict(iter_houses(html_file, max_cards, url_prefix, workers))
 
-def save_to_json(data, filename):
-    """Save data to JSON file."""
+def _write_record(f, mls_id, house_data):
+    """Write a house as a single compact JSON line to a file opened in binary mode."""
+    record = {'mls_id': mls_id, **house_data}
+    if orjson:
+        f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+    else:
+        # json.dumps uses the C encoder in one shot; json.dump on a handle goes through the
+        # pure-Python iterencode path, and a single record is too small to be worth streaming
+        f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+
+def append_jsonl(records, filename):
+    """Append one JSON line per MLS ID to a JSONL file."""
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    with open(filename, 'ab+') as f:
+        # Terminate a partial last line left by an interrupted append
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        
+        for mls_id, house_data in records.items():
+            _write_record(f, mls_id, house_data)
+
+def compact_jsonl(filename):
+    """Rewrite a JSONL file with a single merged line per MLS ID.
+
+    Read errors propagate so the file is never replaced after a failed load.
+    """
+    houses = _read_jsonl(filename)
+    tmp_file = f"{filename}.tmp"
+    with open(tmp_file, 'wb') as f:
+        for mls_id, house_data in houses.items():
+            _write_record(f, mls_id, house_data)
+    os.replace(tmp_file, filename)
+
+def maybe_compact_jsonl(filename):
+    """Compact a JSONL file once it has grown to twice its size after the last compaction."""
+    size_file = f"{filename}.compacted_size"
+    try:
+        with open(size_file, 'r', encoding='utf-8') as f:
+            last_compact_size = int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        last_compact_size = 0
+    
+    if os.path.getsize(filename) <= 2 * last_compact_size:
+        return
+    
+    try:
+        compact_jsonl(filename)
+    except Exception as e:
+        log.error("Skipping compaction of '%s': %s", filename, e)
+        return
+    with open(size_file, 'w', encoding='utf-8') as f:
+        f.write(str(os.path.getsize(filename)))
+    log.info("Compacted '%s'", filename)
+
+def migrate_legacy_json(jsonl_file):
+    """Seed a missing JSONL file from the saved_houses.json it replaces.
+
+    Runs once: after the JSONL file exists the legacy JSON file is left
+    untouched and no longer read.
+    """
+    legacy_file = f"{os.path.splitext(jsonl_file)[0]}.json"
+    if os.path.exists(jsonl_file) or not os.path.exists(legacy_file):
+        return
+    
+    with open(legacy_file, 'rb') as f:
+        houses = orjson.loads(f.read()) if orjson else json.load(f)
+    
+    # Write to a temporary file first so an interrupted migration is retried on the next run
+    tmp_file = f"{jsonl_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        for mls_id, house_data in houses.items():
+            _write_record(f, mls_id, house_data)
+    os.replace(tmp_file, jsonl_file)
+    log.info("Migrated %d houses from '%s' to '%s'", len(houses), legacy_file, jsonl_file)
 
 def update_and_save_houses(new_houses, output_file):
-    print(f"new_houses: {len(new_houses)}")
-    """Load existing houses, update with new data, and save."""
+    log.info("New houses: %d", len(new_houses))
+    """Count updated and new houses, then append them to the JSONL file."""
+    # Carry over houses saved before the switch to JSONL
+    migrate_legacy_json(output_file)
+    
     # Load existing houses
     existing_houses = load_existing_houses(output_file)
-    print(f"existing houses: {len(existing_houses)}")
+    log.info("Existing houses: %d", len(existing_houses))
     
-    # Update existing houses and append new ones
+    # Count existing houses being updated and new ones being added
     updated_count = 0
     new_count = 0
     
     for mls_id, house_data in new_houses.items():
-        print(f"mls_id: {mls_id}")
+        log.debug("MLS ID: %s", mls_id)
         if mls_id in existing_houses:
-            existing_houses[mls_id].update(house_data)
             updated_count += 1
-            # print(f"Updated house with MLS ID {mls_id}")
+            log.debug("Updated house with MLS ID %s", mls_id)
         else:
-            existing_houses[mls_id] = house_data
             new_count += 1
-            # print(f"Added new house with MLS ID {mls_id}")
+            log.debug("Added new house with MLS ID %s", mls_id)
     
-    print(f"\nUpdated {updated_count} existing houses and added {new_count} new houses")
+    log.info("Updated %d existing houses and added %d new houses", updated_count, new_count)
     
-    # Save the updated houses
-    save_to_json(existing_houses, output_file)
+    # Append only this run's houses; older lines are merged on load and on compaction
+    append_jsonl(new_houses, output_file)
+    maybe_compact_jsonl(output_file)
 
 # Main execution
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     # Define paths relative to the script's location
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_dir = os.path.join(os.path.dirname(script_dir), 'data')
     input_file = os.path.join(data_dir, 'cards.html')
-    output_file = os.path.join(data_dir, 'saved_houses.json')
+    output_file = os.path.join(data_dir, 'saved_houses.jsonl')
     
     house_data = parse_house_data(input_file)
     update_and_save_houses(house_data, output_file)
\ No newline at end of file
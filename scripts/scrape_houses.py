@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+import diskcache
+from scrape_details import HTTP_CACHE_DIR, AdaptiveSemaphore, MAX_CONCURRENCY, create_session, get_lot_size, needs_lot_size
+from scrape_house_cards import ZILLOW_URL_PREFIX, iter_houses, load_existing_houses, migrate_legacy_json, update_and_save_houses
+
+log = logging.getLogger(__name__)
+
+async def scrape_houses(html_file, saved_houses=None, max_cards=None, url_prefix=ZILLOW_URL_PREFIX):
+    """Parse property cards and fetch their lot sizes in a single event loop.
+
+    Each card's lot size request is scheduled as soon as the card is parsed,
+    so network I/O overlaps with parsing the rest of the page. Houses that
+    already have a lot size in saved_houses are not fetched again.
+    """
+    saved_houses = saved_houses or {}
+
+    # Dictionary to store houses from this parse
+    houses = {}
+    tasks = {}
+
+    sem = AdaptiveSemaphore(MAX_CONCURRENCY)
+    with diskcache.Cache(HTTP_CACHE_DIR) as cache:
+        async with create_session() as session:
+            for mls_id, house_data in iter_houses(html_file, max_cards, url_prefix):
+                houses[mls_id] = house_data
+                if needs_lot_size({**saved_houses.get(mls_id, {}), **house_data}):
+                    tasks[mls_id] = asyncio.create_task(get_lot_size(session, house_data['details_url'], sem, cache))
+
+                # Let scheduled requests make progress before parsing the next card
+                await asyncio.sleep(0)
+
+            # Merge lot sizes back into the houses they were fetched for
+            lot_sizes = await asyncio.gather(*tasks.values())
+            for mls_id, lot_size in zip(tasks, lot_sizes):
+                if lot_size:
+                    houses[mls_id]['lot_size'] = lot_size
+
+    log.info("Fetched lot size for %d of %d houses", sum(1 for lot_size in lot_sizes if lot_size), len(houses))
+    return houses
+
+# Main execution
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    # Define paths relative to the script's location
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(os.path.dirname(script_dir), 'data')
+    input_file = os.path.join(data_dir, 'cards.html')
+    output_file = os.path.join(data_dir, 'saved_houses.jsonl')
+
+    migrate_legacy_json(output_file)
+    house_data = asyncio.run(scrape_houses(input_file, load_existing_houses(output_file)))
+    update_and_save_houses(house_data, output_file)